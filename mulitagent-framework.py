@@ -1,14 +1,49 @@
 import streamlit as st
-import openai
-import google.generativeai as genai
-import subprocess
-import tempfile
-from typing import Dict, List
+from streamlit.runtime.scriptrunner import RerunException, StopException, add_script_run_ctx, get_script_run_ctx
+import httpx
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+from typing import Dict, Final, List, Optional, Tuple
 import re
+import functools
+import time
+import asyncio
+import hashlib
+import os
+import contextlib
+import weakref
+import importlib
+import json
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from types import MappingProxyType
+from collections import OrderedDict
+
+try:
+    from streamlit.runtime.scriptrunner import SCRIPT_RUN_CONTEXT_ATTR_NAME
+except ImportError:
+    SCRIPT_RUN_CONTEXT_ATTR_NAME = "streamlit_script_run_ctx"  # Not re-exported by every Streamlit release
+
+try:
+    import ahocorasick  # Optional: single-pass keyword scan in validate_code
+except ImportError:
+    ahocorasick = None
 
 # Configuration
-FRAMEWORKS = ["LangGraph", "CrewAI", "AutoGen"]
+FRAMEWORKS: Final = ["LangGraph", "CrewAI", "AutoGen"]
 DEFAULT_LLM = "gemini"  # Changed default to Gemini
+STREAM_FLUSH_INTERVAL = 0.025  # Seconds between re-renders of the streamed code block
+STREAM_FLUSH_MIN_CHARS = 16  # Minimum new characters before re-rendering
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+CACHE_DIR = ".llm_cache"  # Generated code is cached here, keyed by a hash of the request
+MAX_CACHE_ENTRIES = 256  # Least recently used entries beyond this are pruned on write
+MAX_OUTPUT_TOKENS = 1200
+MAX_VARIANTS = 4  # Upper bound for candidates requested in a single call
+MAX_VALIDATED_HASHES = 64  # Validated-code hashes remembered per session
+PROVIDER_CONCURRENCY = {"openai": 10, "gemini": 8}  # Maximum in-flight requests per provider, across all sessions
+PROVIDER_SLOT_POLL_INTERVAL = 0.05  # Seconds between attempts to claim a provider slot
+SCRIPT_REQUEST_POLL_INTERVAL = 0.1  # Seconds between checks for Stop/rerun while a generation runs
 SUPPORTED_LLM_PROVIDERS = {
     "gemini": {
         "models": ["gemini-1.5-pro", "gemini-1.0-pro"],
@@ -24,7 +59,7 @@ SUPPORTED_LLM_PROVIDERS = {
     }
 }
 
-SYSTEM_PROMPTS = {
+SYSTEM_PROMPTS: Final = {
     "LangGraph": """Generate a LangGraph agent system that:
 1. Defines clear state machines with nodes/edges
 2. Includes error handling and state management
@@ -73,71 +108,463 @@ IMPORTANT: Your code MUST include these exact imports and class usage:
 Return ONLY the Python code with required configs."""
 }
 
-def generate_agent_code(prompt: str, framework: str, llm_provider: str, model: str, temp: float, api_key: str) -> str:
-    # Framework-specific details
-    framework_details = {
-        "LangGraph": "Use from langgraph.graph import StateGraph and define a workflow = StateGraph(...)",
-        "CrewAI": "Use from crewai import Agent, Task, Crew and create instances of each",
-        "AutoGen": "Use import autogen and create instances of autogen.UserProxyAgent and autogen.AssistantAgent"
-    }
+# Framework-specific details
+FRAMEWORK_DETAILS = {
+    "LangGraph": "Use from langgraph.graph import StateGraph and define a workflow = StateGraph(...)",
+    "CrewAI": "Use from crewai import Agent, Task, Crew and create instances of each",
+    "AutoGen": "Use import autogen and create instances of autogen.UserProxyAgent and autogen.AssistantAgent"
+}
+
+def _escape_braces(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+# Prompts are pre-joined once at import; only {prompt} is filled in per request
+_USER_PROMPT_TEMPLATES = {
+    fw: "Create a " + fw + " agent for: {prompt}\n\nMake sure to include: " + _escape_braces(FRAMEWORK_DETAILS[fw])
+    for fw in FRAMEWORKS
+}
+# Gemini takes a single prompt, so the system prompt is prepended
+_COMBINED_PROMPT_TEMPLATES = {
+    fw: _escape_braces(SYSTEM_PROMPTS[fw]) + "\n\n" + _USER_PROMPT_TEMPLATES[fw]
+    for fw in FRAMEWORKS
+}
+
+class _CodeBuffer:
+    """Collect streamed chunks in a list and only join them when the full text is read."""
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._text = ""
+
+    def append(self, chunk: str):
+        if chunk:
+            self._parts.append(chunk)
+
+    @property
+    def full_text(self) -> str:
+        if self._parts:
+            self._text = "".join([self._text, *self._parts])
+            self._parts.clear()
+        return self._text
+
+def _cache_key(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+def _cache_get(key: str) -> Optional[List[str]]:
+    path = os.path.join(CACHE_DIR, f"{key}.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            codes = json.load(f)
+        # Touch the entry so pruning evicts the least recently used results first
+        os.utime(path)
+        return codes
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        # A corrupt or truncated entry is treated as a miss and overwritten by the next result
+        return None
+
+def _cache_put(key: str, codes: List[str]):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"{key}.json")
+    # Write to a unique temp file first so concurrent sessions never share or see a partial entry
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(codes, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    _prune_cache()
+
+def _prune_cache():
+    entries = []
+    with os.scandir(CACHE_DIR) as it:
+        for entry in it:
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass
+    if len(entries) <= MAX_CACHE_ENTRIES:
+        return
+    entries.sort()
+    for _, path in entries[:len(entries) - MAX_CACHE_ENTRIES]:
+        # Another session may be pruning the same entries concurrently
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+# Provider SDKs are imported on first use so only the selected provider pays its import cost
+_PROVIDER_MODULES: Dict[str, object] = {}
+
+def _provider_module(name: str):
+    module = _PROVIDER_MODULES.get(name)
+    if module is None:
+        module = _PROVIDER_MODULES[name] = importlib.import_module(name)
+    return module
+
+def _is_transient_error(exc: BaseException) -> bool:
+    """Rate limits and transient connectivity problems are worth retrying with backoff."""
+    transient = ()
+    if "openai" in _PROVIDER_MODULES:
+        openai = _PROVIDER_MODULES["openai"]
+        transient += (openai.RateLimitError, openai.APIConnectionError)
+    if "google.generativeai" in _PROVIDER_MODULES:
+        google_exceptions = _provider_module("google.api_core.exceptions")
+        transient += (google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable)
+    return isinstance(exc, transient)
+
+# Process-wide caps: every session drives its own event loop, so asyncio primitives cannot be shared
+_PROVIDER_SEMAPHORES = {
+    llm_provider: threading.BoundedSemaphore(limit)
+    for llm_provider, limit in PROVIDER_CONCURRENCY.items()
+}
+# time.monotonic() before which no new request is sent, per (provider, hash(api_key))
+_RATE_LIMIT_RESUME_AT: Dict[Tuple[str, int], float] = {}
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def _get_http_client() -> httpx.AsyncClient:
+    # One pool per session; it lives on the session's persistent loop so connections survive reruns
+    return _get_session_runtime().http_client
+
+def create_openai_client(api_key: str) -> "openai.AsyncOpenAI":
+    return _provider_module("openai").AsyncOpenAI(
+        api_key=api_key,
+        http_client=_get_http_client(),
+        max_retries=0  # Retries are handled by tenacity around the provider slot
+    )
+
+def _get_llm_client(llm_provider: str, model: str, api_key: str):
+    """Return the session's client for this provider/model/key, building it only on first use."""
+    # Clients hold connections bound to the event loop, so the cache is reset whenever the loop changes
+    loop = asyncio.get_running_loop()
+    cache = st.session_state.get("_llm_clients")
+    if cache is None or cache["loop"] is not loop:
+        cache = st.session_state["_llm_clients"] = {"loop": loop, "clients": {}}
     
-    enhanced_prompt = f"Create a {framework} agent for: {prompt}\n\nMake sure to include: {framework_details[framework]}"
+    # OpenAI clients are model-agnostic; Gemini binds the model into the client
+    key = (llm_provider, model if llm_provider == "gemini" else None, hash(api_key))
+    client = cache["clients"].get(key)
+    if client is None:
+        if llm_provider == "gemini":
+            # genai.configure() is process-wide, so give each model its own keyed async client instead
+            glm = _provider_module("google.ai.generativelanguage")
+            client = _provider_module("google.generativeai").GenerativeModel(model)
+            client._async_client = glm.GenerativeServiceAsyncClient(client_options={"api_key": api_key})
+        else:
+            client = create_openai_client(api_key)
+        cache["clients"][key] = client
+    return client
+
+class _SessionRuntime:
+    """Event loop, worker thread and HTTP/2 pool owned by one Streamlit session."""
+
+    def __init__(self):
+        # The loop is always driven from the same worker thread
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-event-loop")
+        # HTTP/2 lets concurrent requests multiplex over one connection instead of opening one each
+        self.http_client = httpx.AsyncClient(http2=True, limits=HTTP_LIMITS)
+        # Release everything once the session drops its state entry
+        finalizer = weakref.finalize(self, _close_session_runtime, self.loop, self.executor, self.http_client)
+        finalizer.atexit = False
+
+def _close_session_runtime(loop: asyncio.AbstractEventLoop, executor: ThreadPoolExecutor, http_client: httpx.AsyncClient):
+    def close():
+        try:
+            loop.run_until_complete(http_client.aclose())
+        finally:
+            loop.close()
+    # Closing runs on the loop's own thread; don't block whichever thread the finalizer fires in
+    executor.submit(close)
+    executor.shutdown(wait=False)
+
+def _get_session_runtime() -> _SessionRuntime:
+    runtime = st.session_state.get("_session_runtime")
+    if runtime is None:
+        runtime = st.session_state["_session_runtime"] = _SessionRuntime()
+    return runtime
+
+def _pending_script_request(ctx):
+    """Claim a pending Stop/rerun request for this run, exactly as Streamlit's script runner would."""
+    if ctx is None or ctx.script_requests is None:
+        return None
+    return ctx.script_requests.on_scriptrunner_yield()
+
+def _script_control_exception(request) -> BaseException:
+    if request.type.name == "RERUN":
+        return RerunException(request.rerun_data)
+    return StopException()
+
+def run_async(coro):
+    """Run a coroutine on the session's persistent event loop and wait for its result."""
+    runtime = _get_session_runtime()
+    ctx = get_script_run_ctx()
+    started = Future()
     
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPTS[framework]},
-        {"role": "user", "content": enhanced_prompt}
-    ]
+    def run():
+        thread = threading.current_thread()
+        task = runtime.loop.create_task(coro)
+        started.set_result(task)
+        try:
+            # Streamlit calls made by the coroutine need the current script run context
+            add_script_run_ctx(thread, ctx)
+            return runtime.loop.run_until_complete(task)
+        finally:
+            # Don't leave this run's context attached to the idle worker thread
+            setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
     
+    future = runtime.executor.submit(run)
+    task = started.result()
+    # Streamlit only acts on Stop/rerun from the script thread, so poll for them while the worker runs
+    while True:
+        try:
+            return future.result(timeout=SCRIPT_REQUEST_POLL_INTERVAL)
+        except FuturesTimeoutError:
+            request = _pending_script_request(ctx)
+            if request is None:
+                continue
+            runtime.loop.call_soon_threadsafe(task.cancel)
+            # Wait for the coroutine to unwind so it writes nothing after control returns to Streamlit
+            with contextlib.suppress(asyncio.CancelledError):
+                future.result()
+            raise _script_control_exception(request)
+
+async def _acquire_provider_slot(llm_provider: str) -> threading.BoundedSemaphore:
+    semaphore = _PROVIDER_SEMAPHORES[llm_provider]
+    # Poll instead of blocking so a waiting request never stalls the other tasks on this loop
+    while not semaphore.acquire(blocking=False):
+        await asyncio.sleep(PROVIDER_SLOT_POLL_INTERVAL)
+    return semaphore
+
+def _parse_reset_duration(value: str) -> float:
+    # OpenAI reports resets as durations such as "20ms", "1s" or "6m0s"
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in _DURATION_PART.findall(value))
+
+def _record_rate_limit_headers(llm_provider: str, api_key: str, headers):
+    """Pause new requests with this key until its limit resets once the remaining budget runs out."""
+    for kind, threshold in (("requests", 1), ("tokens", MAX_OUTPUT_TOKENS)):
+        remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+        reset = headers.get(f"x-ratelimit-reset-{kind}")
+        if remaining is None or reset is None:
+            continue
+        try:
+            exhausted = int(remaining) < threshold
+        except ValueError:
+            continue
+        if exhausted:
+            key = (llm_provider, hash(api_key))
+            resume_at = time.monotonic() + _parse_reset_duration(reset)
+            _RATE_LIMIT_RESUME_AT[key] = max(_RATE_LIMIT_RESUME_AT.get(key, 0.0), resume_at)
+
+def _rate_limit_delay(llm_provider: str, api_key: str) -> float:
+    return _RATE_LIMIT_RESUME_AT.get((llm_provider, hash(api_key)), 0.0) - time.monotonic()
+
+async def _wait_for_rate_limit(llm_provider: str, api_key: str):
+    delay = _rate_limit_delay(llm_provider, api_key)
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+# Request settings only depend on the sidebar values, so they are built once per combination
+@functools.lru_cache(maxsize=16)
+def _gemini_generation_config(temp: float, variants: int = 1):
+    return _provider_module("google.generativeai").GenerationConfig(temperature=temp, candidate_count=variants)
+
+@functools.lru_cache(maxsize=16)
+def _openai_request_options(model: str, temp: float, variants: int = 1) -> MappingProxyType:
+    # Read-only because the same mapping is shared by every request with these settings
+    return MappingProxyType({"model": model, "temperature": temp, "max_tokens": MAX_OUTPUT_TOKENS, "n": variants, "stream": True})
+
+async def _iter_async(items):
+    for item in items:
+        yield item
+
+async def _open_stream(prompt: str, framework: str, enhanced_prompt: str, llm_provider: str, model: str, temp: float, api_key: str, variants: int = 1):
+    """Open the provider stream and return an async iterator of (variant index, text chunk) pairs."""
+    # Only opening the stream is retried; a failure mid-stream would duplicate rendered output
+    client = _get_llm_client(llm_provider, model, api_key)
     if llm_provider == "gemini":
-        genai.configure(api_key=api_key)
-        model_obj = genai.GenerativeModel(model)
-        
         # Combine system prompt and user prompt for Gemini
-        combined_prompt = f"{messages[0]['content']}\n\n{messages[1]['content']}"
-        response = model_obj.generate_content(combined_prompt, generation_config=genai.GenerationConfig(temperature=temp))
-        return response.text
+        combined_prompt = _COMBINED_PROMPT_TEMPLATES[framework].format(prompt=prompt)
+        generation_config = _gemini_generation_config(temp, variants)
+        if variants == 1:
+            response = await client.generate_content_async(combined_prompt, generation_config=generation_config, stream=True)
+            return ((0, chunk.text) async for chunk in response)
+        
+        # Gemini only streams a single candidate, so multiple variants arrive in one response
+        response = await client.generate_content_async(combined_prompt, generation_config=generation_config)
+        return _iter_async(
+            (index, "".join(part.text for part in candidate.content.parts))
+            for index, candidate in enumerate(response.candidates)
+        )
     elif llm_provider == "openai":
-        client = openai.OpenAI(api_key=api_key)  # Create OpenAI client
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=temp,
-            max_tokens=1200
+        raw_response = await client.chat.completions.with_raw_response.create(
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPTS[framework]},
+                {"role": "user", "content": enhanced_prompt}
+            ],
+            **_openai_request_options(model, temp, variants)
         )
-        return response.choices[0].message.content
-    elif llm_provider == "anthropic":
+        _record_rate_limit_headers(llm_provider, api_key, raw_response.headers)
+        response = raw_response.parse()
+        return ((choice.index, choice.delta.content or "") async for chunk in response for choice in chunk.choices)
+    raise ValueError(f"Unsupported LLM provider: {llm_provider}")
+
+@retry(
+    wait=wait_exponential(multiplier=1, min=1, max=16),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception(_is_transient_error),
+    reraise=True
+)
+async def _open_stream_in_slot(prompt: str, framework: str, enhanced_prompt: str, llm_provider: str, model: str, temp: float, api_key: str, variants: int = 1):
+    """Claim a provider slot and open the stream; the caller releases the returned slot once it is consumed."""
+    while True:
+        # Wait out the key's rate limit before claiming a slot so an exhausted key never holds one idle
+        await _wait_for_rate_limit(llm_provider, api_key)
+        semaphore = await _acquire_provider_slot(llm_provider)
+        if _rate_limit_delay(llm_provider, api_key) <= 0:
+            break
+        # Another request hit the limit while this one waited for the slot
+        semaphore.release()
+    try:
+        return semaphore, await _open_stream(prompt, framework, enhanced_prompt, llm_provider, model, temp, api_key, variants)
+    except BaseException:
+        # Free the slot before tenacity backs off, so retries never sleep while holding it
+        semaphore.release()
+        raise
+
+async def _render_stream(chunks, variants: int = 1, placeholders=None) -> List[str]:
+    # Render each variant progressively, coalescing tiny chunks into batched re-renders
+    buffers = [_CodeBuffer() for _ in range(variants)]
+    pending = [0] * variants
+    last_flush = [time.monotonic()] * variants
+    async for index, chunk in chunks:
+        buffers[index].append(chunk)
+        pending[index] += len(chunk)
+        if placeholders is None or pending[index] < STREAM_FLUSH_MIN_CHARS:
+            continue
+        now = time.monotonic()
+        if now - last_flush[index] >= STREAM_FLUSH_INTERVAL:
+            placeholders[index].code(buffers[index].full_text, language="python")
+            pending[index] = 0
+            last_flush[index] = now
+    codes = [buffer.full_text for buffer in buffers]
+    _show_codes(codes, placeholders)
+    return codes
+
+def _show_codes(codes: List[str], placeholders=None):
+    if placeholders is not None:
+        for placeholder, code in zip(placeholders, codes):
+            placeholder.code(code, language="python")
+
+async def generate_agent_code(prompt: str, framework: str, llm_provider: str, model: str, temp: float, api_key: str, placeholders=None, variants: int = 1, use_cache: bool = True) -> List[str]:
+    """Generate `variants` candidate implementations in one request, streaming each into its placeholder."""
+    enhanced_prompt = _USER_PROMPT_TEMPLATES[framework].format(prompt=prompt)
+    
+    # Identical requests are served from the disk cache without calling the LLM
+    cache_key = _cache_key(llm_provider, model, str(temp), str(variants), framework, SYSTEM_PROMPTS[framework], enhanced_prompt)
+    if use_cache:
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            _show_codes(cached, placeholders)
+            return cached
+    
+    if llm_provider == "anthropic":
         # This would require Anthropic's API integration
-        # For now, fallback to OpenAI if selected
-        return "Anthropic integration not yet implemented"
+        codes = ["Anthropic integration not yet implemented"] * variants
+        _show_codes(codes, placeholders)
+        return codes
+    
+    # Cap in-flight requests per provider, holding the slot for the whole stream
+    semaphore, chunks = await _open_stream_in_slot(prompt, framework, enhanced_prompt, llm_provider, model, temp, api_key, variants)
+    try:
+        codes = await _render_stream(chunks, variants, placeholders)
+    finally:
+        semaphore.release()
+    
+    # Only cache output that passes validation, so a failed generation is not replayed
+    if all(code and validate_code(framework, code) for code in codes):
+        _cache_put(cache_key, codes)
+    return codes
+
+# Every pattern for a framework must match; \s* keeps the checks insensitive to spacing
+_VALIDATORS = {
+    "CrewAI": tuple(re.compile(p, re.IGNORECASE) for p in (
+        r"crewai",  # Check for basic import
+        r"agent",   # Check for agent creation
+        r"task",    # Check for task creation
+        r"crew"     # Check for crew creation
+    )),
+    "LangGraph": tuple(re.compile(p, re.IGNORECASE) for p in (
+        # Check for langgraph import and StateGraph usage
+        r"from\s*langgraph\.graph\s*import|import\s*langgraph",
+        r"stategraph\s*\(|=\s*stategraph"
+    )),
+    "AutoGen": tuple(re.compile(p, re.IGNORECASE) for p in (
+        # Check for autogen imports and agent usage
+        r"import\s*autogen|from\s*autogen\s*import",
+        r"userproxyagent|assistantagent|groupchatmanager|agent\s*="
+    ))
+}
+
+# Keywords every valid implementation must contain, used as a single-pass prefilter
+_REQUIRED_KEYWORDS = {
+    "CrewAI": {"crewai", "agent", "task", "crew"},
+    "LangGraph": {"langgraph", "stategraph"},
+    # Not "agent": the regex also accepts GroupChatManager on its own
+    "AutoGen": {"autogen"}
+}
+# Frameworks whose validators are nothing but keyword checks need no regex confirmation
+_KEYWORD_ONLY = {
+    fw for fw, patterns in _VALIDATORS.items()
+    if {pattern.pattern for pattern in patterns} <= _REQUIRED_KEYWORDS[fw]
+}
+
+def _build_keyword_automaton():
+    automaton = ahocorasick.Automaton()
+    for keyword in set().union(*_REQUIRED_KEYWORDS.values()):
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton() if ahocorasick is not None else None
+
+@functools.lru_cache(maxsize=32)
+def _matches_framework(framework: str, code: str) -> bool:
+    patterns = _VALIDATORS.get(framework)
+    if patterns is None:
+        return False
+    
+    if _KEYWORD_AUTOMATON is not None:
+        # One Aho-Corasick pass finds every keyword instead of one search per pattern
+        found = {keyword for _, keyword in _KEYWORD_AUTOMATON.iter(code.lower())}
+        if not _REQUIRED_KEYWORDS[framework] <= found:
+            return False
+        if framework in _KEYWORD_ONLY:
+            return True
+    
+    # Case-insensitive search avoids building a normalized copy of the code
+    return all(pattern.search(code) for pattern in patterns)
 
 def validate_code(framework: str, code: str) -> bool:
     try:
-        code_normalized = code.replace(" ", "").lower()
-        
-        if framework == "CrewAI":
-            # Simplified validation for CrewAI
-            required_elements = [
-                "crewai",  # Check for basic import
-                "agent",   # Check for agent creation
-                "task",    # Check for task creation
-                "crew"     # Check for crew creation
-            ]
-            return all(element in code_normalized for element in required_elements)
-        
-        elif framework == "LangGraph":
-            # Check for langgraph import and StateGraph usage
-            has_import = "fromlanggraph.graphimport" in code_normalized or "importlanggraph" in code_normalized
-            has_stategraph = "stategraph(" in code_normalized or "=stategraph" in code_normalized
-            return has_import and has_stategraph
-        
-        elif framework == "AutoGen":
-            # Check for autogen imports and agent usage
-            has_import = "importautogen" in code_normalized or "fromautogenimport" in code_normalized
-            has_agent = "userproxyagent" in code_normalized or "assistantagent" in code_normalized
-            has_manager = "groupchatmanager" in code_normalized or "agent=" in code_normalized
-            return has_import and (has_agent or has_manager)
+        # Code already validated this session (e.g. a cache hit) is accepted without rescanning
+        validated = st.session_state.setdefault("_validated", OrderedDict())
+        code_hash = hash((framework, code))
+        if code_hash in validated:
+            validated.move_to_end(code_hash)
+            return True
         
-        return False
+        if not _matches_framework(framework, code):
+            return False
+        validated[code_hash] = None
+        # Keep only the most recently used entries
+        while len(validated) > MAX_VALIDATED_HASHES:
+            validated.popitem(last=False)
+        return True
     except Exception as e:
         st.error(f"Validation error: {str(e)}")
         return False
@@ -150,6 +577,7 @@ def display_framework_info(framework: str):
     }
     st.info(f"**{framework}**: {info[framework]}")
 
+@st.cache_data
 def get_dependencies(framework: str) -> str:
     deps = {
         "LangGraph": "langgraph",
@@ -159,44 +587,110 @@ def get_dependencies(framework: str) -> str:
     base_deps = f"{deps[framework]} python-dotenv google-generativeai\n"
     return base_deps
 
+# Matches every code fence, with or without a language tag, in a single pass
+_CODE_FENCE = re.compile(r'```(?:python|py)?\s*')
+
+@functools.lru_cache(maxsize=32)
 def clean_code(code: str) -> str:
     """Remove markdown formatting and other non-Python elements from generated code."""
-    # Remove code block markers
-    code = re.sub(r'```(?:python|py)?\s*', '', code)
-    code = code.replace('```', '')
-    
-    # Strip any non-code explanations before or after the actual code
-    code = code.strip()
-    
-    return code
+    # Remove code block markers and strip any non-code explanations before or after the actual code
+    return _CODE_FENCE.sub('', code).strip()
 
 def test_agent(code: str, test_input: str) -> List[str]:
     try:
         # Clean the code before executing it
         cleaned_code = clean_code(code)
         
-        with tempfile.NamedTemporaryFile(mode="w+", suffix=".py") as tmp:
-            tmp.write(cleaned_code)
-            tmp.flush()
+        try:
+            # Instead of directly executing the code, just check if it's valid Python syntax
+            compile(cleaned_code, "<agent>", "exec")
             
-            try:
-                # Instead of directly executing the code, just check if it's valid Python syntax
-                syntax_check = subprocess.run(
-                    ["python", "-m", "py_compile", tmp.name],
-                    capture_output=True,
-                    text=True
-                )
-                
-                if syntax_check.returncode != 0:
-                    return [f"Syntax Error: {syntax_check.stderr}"]
-                
-                # If syntax is valid, return success (without executing, which may cause errors)
-                return ["Test completed successfully: Code syntax is valid"]
-            except Exception as e:
-                return [f"Test Error: {str(e)}"]
+            # If syntax is valid, return success (without executing, which may cause errors)
+            return ["Test completed successfully: Code syntax is valid"]
+        except SyntaxError as e:
+            return [f"Syntax Error: {e.msg} at line {e.lineno}"]
+        except Exception as e:
+            return [f"Test Error: {str(e)}"]
     except Exception as e:
         return [f"Code Execution Error: {str(e)}"]
 
+def render_agent_result(container, framework: str, code: str, include_test: bool, install_deps: bool, variant: Optional[int] = None):
+    # Show raw code for debugging if validation fails
+    if not validate_code(framework, code):
+        container.error(f"The generated code doesn't match the expected structure for {framework}.")
+        container.warning("The generated code is shown above for reference.")
+        
+        # Help message
+        container.info(f"""
+        For {framework}, the code should include:
+        - Proper imports for the {framework} framework
+        - Correct class usage as specified in the instructions
+        
+        You may want to try:
+        1. Adjusting your prompt to be more specific
+        2. Lowering the temperature value
+        3. Trying a different model
+        """)
+        return
+    
+    container.success("✅ System Generated Successfully!")
+    cleaned_code = clean_code(code)
+    
+    # Test Section
+    if include_test:
+        test_results = test_agent(code, "Test input")
+        if "Test completed successfully" in test_results[0]:
+            container.success("✅ System Test Passed")
+        else:
+            container.error(test_results[0])
+    
+    # Installation Instructions
+    if install_deps:
+        container.markdown(f"```bash\npip install {get_dependencies(framework)}```")
+    
+    # Download Options
+    suffix = "" if variant is None else f"_{variant + 1}"
+    col1, col2 = container.columns(2)
+    col1.download_button(
+        label="📥 Download Code",
+        data=cleaned_code,
+        file_name=f"{framework.lower()}_system{suffix}.py",
+        mime="text/python",
+        key=f"download_code_{framework}{suffix}"
+    )
+    col2.download_button(
+        label="📦 Requirements",
+        data=get_dependencies(framework),
+        file_name="requirements.txt",
+        mime="text/plain",
+        key=f"download_requirements_{framework}{suffix}"
+    )
+
+async def build_agent_system(container, prompt: str, framework: str, llm_provider: str, model: str, temp: float, api_key: str, include_test: bool, install_deps: bool, variants: int = 1, use_cache: bool = True):
+    # Elements are written through the container explicitly so concurrent builds never share a context
+    panes = [container] if variants == 1 else container.tabs([f"Variant {i + 1}" for i in range(variants)])
+    
+    # Stream the code into the expanders as it is generated
+    placeholders = [pane.expander("Implementation Code", expanded=True).empty() for pane in panes]
+    codes = await generate_agent_code(prompt, framework, llm_provider, model, temp, api_key, placeholders, variants, use_cache)
+    
+    for index, (pane, code) in enumerate(zip(panes, codes)):
+        render_agent_result(pane, framework, code, include_test, install_deps, None if variants == 1 else index)
+
+async def build_all_agent_systems(prompt: str, llm_provider: str, model: str, temp: float, api_key: str, include_test: bool, install_deps: bool, variants: int = 1, use_cache: bool = True):
+    tabs = st.tabs(FRAMEWORKS)
+    
+    # Every framework goes through the same session client, so requests share a connection pool
+    results = await asyncio.gather(
+        *(build_agent_system(tab, prompt, framework, llm_provider, model, temp, api_key, include_test, install_deps, variants, use_cache)
+          for tab, framework in zip(tabs, FRAMEWORKS)),
+        return_exceptions=True
+    )
+    
+    for tab, result in zip(tabs, results):
+        if isinstance(result, Exception):
+            tab.error(f"Generation Error: {str(result)}")
+
 TEMPLATE_EXAMPLES = {
     "LangGraph": {
         "Customer Support": "Create a customer support workflow with initial triage and escalation",
@@ -212,6 +706,38 @@ TEMPLATE_EXAMPLES = {
     }
 }
 
+@st.cache_data
+def get_templates(framework: str) -> List[Tuple[str, str, str]]:
+    """Return (name markdown, description markdown, prompt) for each template of a framework."""
+    return [
+        (f"**{template_name}**", f"_{template_desc}_", template_desc)
+        for template_name, template_desc in TEMPLATE_EXAMPLES.get(framework, {}).items()
+    ]
+
+def _use_template(template_desc: str):
+    st.session_state.prompt = template_desc
+
+@st.fragment
+def render_prompt_editor(framework: str):
+    # Typing or picking a template only reruns this fragment, not the whole app
+    # Template Display Section
+    st.subheader("📋 Quick Start Templates")
+    templates = get_templates(framework)
+    if templates:
+        cols = st.columns(len(templates))
+        for idx, (name_markdown, desc_markdown, template_desc) in enumerate(templates):
+            with cols[idx]:
+                st.markdown(name_markdown)
+                st.markdown(desc_markdown)
+                st.button(f"Use Template", key=f"template_{idx}", on_click=_use_template, args=(template_desc,))
+    
+    st.divider()
+    
+    st.text_area("Describe your agent system:", 
+                 key="prompt",
+                 height=150,
+                 placeholder="e.g. 'Create a customer support system with specialist and escalation agents'")
+
 def main():
     st.set_page_config(page_title="Multi-Agent Factory", page_icon="🤖", layout="wide")
     st.title(" Multi-Framework AI Agent Generator")
@@ -228,38 +754,25 @@ def main():
         api_key = st.text_input(f"{llm_provider.capitalize()} API Key", type="password")
         framework = st.selectbox("Framework", FRAMEWORKS)
         temp = st.slider("Temperature", 0.0, 1.0, 0.5)
+        variants = st.number_input("Variants", min_value=1, max_value=MAX_VARIANTS, value=1, help="Number of alternative implementations requested in a single call")
+        use_cache = st.checkbox("Reuse cached responses", True, help="Return the previous result for identical requests instead of calling the LLM again")
         st.divider()
         #display_framework_info(framework)
         st.markdown("- **LangGraph**: State machines\n- **CrewAI**: Team workflows\n- **AutoGen**: Chat agents")
 
-    st.divider()
-    # Template Display Section
-    st.subheader("📋 Quick Start Templates")
-    if framework in TEMPLATE_EXAMPLES:
-        cols = st.columns(len(TEMPLATE_EXAMPLES[framework]))
-        for idx, (template_name, template_desc) in enumerate(TEMPLATE_EXAMPLES[framework].items()):
-            with cols[idx]:
-                st.markdown(f"**{template_name}**")
-                st.markdown(f"_{template_desc}_")
-                if st.button(f"Use Template", key=f"template_{idx}"):
-                    st.session_state.prompt = template_desc
-    
     st.divider()
     
     # Main Interface
     col1, col2 = st.columns([3, 1])
     with col1:
-        prompt = st.text_area("Describe your agent system:", 
-                            value=st.session_state.prompt,
-                            height=150,
-                            placeholder="e.g. 'Create a customer support system with specialist and escalation agents'")
-        # Update session state when text area changes
-        st.session_state.prompt = prompt
+        render_prompt_editor(framework)
+        prompt = st.session_state.prompt
     
     with col2:
         st.write("## Generation Options")
         include_test = st.checkbox("Include test script", True)
         install_deps = st.checkbox("Show installation instructions", True)
+        all_frameworks = st.checkbox("Generate for all frameworks", False)
         generate_btn = st.button("Generate Agent System")
     
     if generate_btn:
@@ -267,65 +780,21 @@ def main():
             st.error("Please fill all required fields")
             return
         
+        if all_frameworks:
+            with st.spinner(f"🧩 Building {', '.join(FRAMEWORKS)} systems..."):
+                try:
+                    run_async(build_all_agent_systems(prompt, llm_provider, model, temp, api_key, include_test, install_deps, variants, use_cache))
+                except (StopException, RerunException):
+                    raise
+                except Exception as e:
+                    st.error(f"Generation Error: {str(e)}")
+            return
+        
         with st.spinner(f"🧩 Building {framework} system..."):
             try:
-                code = generate_agent_code(prompt, framework, llm_provider, model, temp, api_key)
-                
-                # Show raw code for debugging if validation fails
-                if not validate_code(framework, code):
-                    st.error(f"The generated code doesn't match the expected structure for {framework}.")
-                    st.warning("Here's the generated code for reference:")
-                    st.code(code, language="python")
-                    
-                    # Help message
-                    st.info(f"""
-                    For {framework}, the code should include:
-                    - Proper imports for the {framework} framework
-                    - Correct class usage as specified in the instructions
-                    
-                    You may want to try:
-                    1. Adjusting your prompt to be more specific
-                    2. Lowering the temperature value
-                    3. Trying a different model
-                    """)
-                    return
-                
-                st.success("✅ System Generated Successfully!")
-                
-                # Code Display
-                with st.expander("Implementation Code", expanded=True):
-                    st.code(code, language="python")
-                
-                # Test Section
-                if include_test:
-                    test_results = test_agent(code, "Test input")
-                    if "Test completed successfully" in test_results[0]:
-                        st.success("✅ System Test Passed")
-                    else:
-                        st.error(test_results[0])
-                
-                # Installation Instructions
-                if install_deps:
-                    st.markdown(f"```bash\npip install {get_dependencies(framework)}```")
-                
-                # Download Options
-                cleaned_code = clean_code(code)
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.download_button(
-                        label="📥 Download Code",
-                        data=cleaned_code,
-                        file_name=f"{framework.lower()}_system.py",
-                        mime="text/python"
-                    )
-                with col2:
-                    st.download_button(
-                        label="📦 Requirements",
-                        data=get_dependencies(framework),
-                        file_name="requirements.txt",
-                        mime="text/plain"
-                    )
-                
+                run_async(build_agent_system(st, prompt, framework, llm_provider, model, temp, api_key, include_test, install_deps, variants, use_cache))
+            except (StopException, RerunException):
+                raise
             except Exception as e:
                 st.error(f"Generation Error: {str(e)}")
 